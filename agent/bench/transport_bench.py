@@ -0,0 +1,93 @@
+"""Compare the default Supabase client against the shared transport.
+
+Runs the agent's steady-state traffic (heartbeat, settings poll, command poll
+and a small storage upload) against a local HTTP stand-in, with idle gaps
+between rounds like the real poll intervals. Reports connections opened and
+mean request latency for each client.
+
+    python agent/bench/transport_bench.py --rounds 5 --gap 6
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from supabase import ClientOptions, create_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from services.transport import create_http_client
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        type(self).connections += 1
+
+    def respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.path.startswith("/storage/"):
+            body = b'{"Key": "screenshots/bench.png", "Id": "1", "path": "bench.png"}'
+        else:
+            body = b'[{"id": "1", "settings": {}}]'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = respond
+
+    def log_message(self, *args):
+        pass
+
+def run(client, rounds, gap):
+    latencies = []
+    for i in range(rounds):
+        if i:
+            time.sleep(gap)
+        calls = [
+            lambda: client.table("employees").update({"last_seen": "now()"}).eq("id", "1").execute(),
+            lambda: client.table("employees").select("settings").eq("id", "1").execute(),
+            lambda: client.table("commands").select("*").eq("employee_id", "1").eq("status", "PENDING").execute(),
+            lambda: client.storage.from_("screenshots").upload(
+                file=b"\x89PNG" + b"\0" * 4096, path=f"1/bench_{i}.png", file_options={"content-type": "image/png", "upsert": "true"}
+            ),
+        ]
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--gap", type=float, default=6.0, help="idle seconds between rounds")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    clients = {
+        "default create_client": lambda: create_client(url, "bench-key"),
+        "shared transport": lambda: create_client(url, "bench-key", options=ClientOptions(httpx_client=create_http_client())),
+    }
+    for name, factory in clients.items():
+        StandIn.connections = 0
+        latencies = run(factory(), args.rounds, args.gap)
+        mean_ms = sum(latencies) / len(latencies) * 1000
+        print(f"{name:24} {len(latencies)} requests, {StandIn.connections} connections, {mean_ms:.2f} ms/request")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
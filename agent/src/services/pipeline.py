@@ -0,0 +1,89 @@
+import asyncio
+import collections
+import os
+
+# Log helper
+log_file = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'agent.log')
+def log(msg):
+    try:
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(f"[Pipeline] {msg}\n")
+    except:
+        pass
+
+# What to do when a put would exceed the queue's limits
+DROP_POLICIES = ("block", "oldest", "newest", "downscale")
+
+class BoundedQueue:
+    """Queue between two pipeline stages, bounded by item count and bytes.
+
+    When full, `put` applies the drop policy: "block" waits for the consumer,
+    "oldest" evicts queued items, "newest" discards the incoming item and
+    "downscale" shrinks it with the `downscale` callback (falling back to
+    "oldest" once it cannot shrink any further). `pressure()` reports how
+    full the queue is so producers can slow down before anything is dropped.
+    """
+
+    def __init__(self, name, max_items, max_bytes, policy="oldest", downscale=None):
+        self.name = name
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.policy = policy if policy in DROP_POLICIES else "oldest"
+        self.downscale = downscale
+        self.items = collections.deque()
+        self.bytes = 0
+        self.dropped = 0
+        self._changed = asyncio.Condition()
+
+    def set_limits(self, max_bytes=None, policy=None):
+        if max_bytes:
+            self.max_bytes = max_bytes
+        if policy in DROP_POLICIES:
+            self.policy = policy
+
+    def pressure(self):
+        """Fill level from 0.0 (empty) to 1.0 (at either limit)."""
+        return min(1.0, max(len(self.items) / self.max_items, self.bytes / self.max_bytes))
+
+    def fits(self, size):
+        return len(self.items) < self.max_items and self.bytes + size <= self.max_bytes
+
+    async def put(self, item, size):
+        """Queue `item`. Returns False if it was dropped."""
+        async with self._changed:
+            if self.policy == "block":
+                await self._changed.wait_for(lambda: not self.items or self.fits(size))
+
+            if self.policy == "downscale" and self.downscale:
+                while not self.fits(size):
+                    smaller = self.downscale(item)
+                    if smaller is None:
+                        break
+                    item, size = smaller
+
+            if self.policy == "newest" and not self.fits(size):
+                self._drop()
+                return False
+
+            while self.items and not self.fits(size):
+                _, old_size = self.items.popleft()
+                self.bytes -= old_size
+                self._drop()
+
+            self.items.append((item, size))
+            self.bytes += size
+            self._changed.notify_all()
+            return True
+
+    async def get(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.items)
+            item, size = self.items.popleft()
+            self.bytes -= size
+            self._changed.notify_all()
+            return item
+
+    def _drop(self):
+        self.dropped += 1
+        if self.dropped == 1 or self.dropped % 10 == 0:
+            log(f"{self.name}: dropped {self.dropped} item(s) ({self.policy})")
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import time
+
+# Log helper
+log_file = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'agent.log')
+def log(msg):
+    try:
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(f"[Scheduler] {msg}\n")
+    except:
+        pass
+
+# Status codes the backend uses to ask clients to slow down
+THROTTLE_STATUSES = {429, 503}
+
+class Scheduler:
+    """Shared timer for all periodic agent work.
+
+    Every wait is aligned to a per-host grid (derived from the host key) so
+    a fleet of agents spreads its requests across the interval instead of
+    hitting the backend in lockstep. Waiters due within `window` seconds of
+    each other are released by a single wake-up, and a server-suggested
+    backoff (429/503) holds every waiter until it expires.
+    """
+
+    def __init__(self, host_key: str, window: float = 1.0, spread: float = 3600, max_backoff: float = 600):
+        self.window = window
+        self.max_backoff = max_backoff
+        digest = hashlib.sha256(host_key.encode("utf-8")).digest()
+        self.host_fraction = int.from_bytes(digest[:8], "big") / 2 ** 64
+        self.offset = self.host_fraction * spread
+        self.backoff_until = 0.0
+        self.throttle_streak = 0
+        self.last_due = {}
+        self._loop = None
+        self._heap = []
+        self._seq = itertools.count()
+        self._changed = None
+        self._task = None
+
+    def next_slot(self, interval, after=None):
+        """Next point on this host's grid for `interval`, strictly after `after`."""
+        now = time.time() if after is None else after
+        if interval <= 0:
+            return now
+        k = (now - self.offset) // interval + 1
+        return self.offset + k * interval
+
+    async def wait(self, name, interval):
+        """Sleep until the next slot for `interval`, honouring any backoff."""
+        self._ensure_runner()
+        # Coalescing can release a waiter before its slot, so step past the last one
+        after = max(time.time(), self.last_due.get(name, 0))
+        due = max(self.next_slot(interval, after), self.backoff_until)
+        self.last_due[name] = due
+        fut = self._loop.create_future()
+        heapq.heappush(self._heap, (due, next(self._seq), name, fut))
+        self._changed.set()
+        await fut
+
+    def backoff(self, seconds):
+        """Hold all waiters for `seconds`, plus a per-host share of jitter."""
+        seconds = min(max(seconds, 0), self.max_backoff)
+        until = time.time() + seconds * (1 + 0.1 * self.host_fraction)
+        if until > self.backoff_until:
+            self.backoff_until = until
+            log(f"Backing off {until - time.time():.1f}s")
+            if self._changed:
+                self._changed.set()
+
+    def note_error(self, error):
+        """Apply backoff if `error` is a 429/503 from the backend. Returns True if it was."""
+        status, retry_after = self._throttle_info(error)
+        if status not in THROTTLE_STATUSES:
+            return False
+
+        now = time.time()
+        if now > self.backoff_until + self.max_backoff:
+            self.throttle_streak = 0
+        self.throttle_streak += 1
+
+        if retry_after is None:
+            retry_after = min(2 ** self.throttle_streak, self.max_backoff)
+        self.backoff(retry_after)
+        return True
+
+    def _throttle_info(self, error):
+        # storage3 chains the httpx.HTTPStatusError; postgrest errors carry only a code
+        response = getattr(error, "response", None) or getattr(error.__cause__, "response", None)
+
+        candidates = [getattr(response, "status_code", None), getattr(error, "status", None), getattr(error, "code", None)]
+        if error.args and isinstance(error.args[0], dict):
+            details = error.args[0]
+            candidates += [details.get("statusCode"), details.get("status"), details.get("code")]
+
+        status = None
+        for candidate in candidates:
+            try:
+                status = int(candidate)
+                break
+            except (TypeError, ValueError):
+                pass
+        if status is None:
+            return None, None
+
+        retry_after = None
+        headers = getattr(response, "headers", None)
+        if headers:
+            try:
+                retry_after = float(headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        return status, retry_after
+
+    def _ensure_runner(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # main() may be re-run under a fresh event loop after a crash
+            self._loop = loop
+            self._heap = []
+            self._changed = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+
+            now = time.time()
+            due = max(self._heap[0][0], self.backoff_until)
+            if due > now:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Release everything falling due in this window with one wake-up
+            horizon = now + self.window
+            while self._heap and self._heap[0][0] <= horizon:
+                _, _, _, fut = heapq.heappop(self._heap)
+                if not fut.done():
+                    fut.set_result(None)
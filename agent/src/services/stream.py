@@ -5,6 +5,9 @@ import os
 import secrets
 from supabase import Client
 
+from services.bandwidth import BandwidthGovernor
+from services.scheduler import Scheduler
+
 # Log helper
 log_file = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'agent.log')
 def log(msg):
@@ -15,10 +18,16 @@ def log(msg):
     except:
         pass
 
+# Listing previews
+POSTER_WIDTH = 320
+POSTER_QUALITY = 70
+
 class VideoRecorderService:
-    def __init__(self, supabase: Client, employee_id: str):
+    def __init__(self, supabase: Client, employee_id: str, scheduler: Scheduler, governor: BandwidthGovernor):
         self.supabase = supabase
         self.employee_id = employee_id
+        self.scheduler = scheduler
+        self.governor = governor
         self.is_recording = False
         self.default_duration = 10
         self.cache_dir = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'videos')
@@ -31,7 +40,7 @@ class VideoRecorderService:
 
         while True:
             await self.poll_commands()
-            await asyncio.sleep(2)
+            await self.scheduler.wait("video-poll", 2)
 
     async def get_duration(self):
         try:
@@ -55,6 +64,7 @@ class VideoRecorderService:
                 await self.handle_command(cmd)
         except Exception as e:
             log(f"Poll error: {e}")
+            self.scheduler.note_error(e)
 
     async def handle_command(self, cmd):
         if self.is_recording:
@@ -93,11 +103,15 @@ class VideoRecorderService:
         out = cv2.VideoWriter(cache_path, codec, 20.0, (width, height))
         
         start_time = time.time()
+        poster_saved = False
         try:
             while int(time.time() - start_time) < duration:
                 ret, frame = cap.read()
                 if ret:
                     out.write(frame)
+                    if not poster_saved:
+                        self.save_poster(frame, self.poster_path(cache_path))
+                        poster_saved = True
                 await asyncio.sleep(0.01)
         finally:
             cap.release()
@@ -116,24 +130,54 @@ class VideoRecorderService:
         self.is_recording = False
         return True
 
+    def poster_path(self, path):
+        return os.path.splitext(path)[0] + "_poster.jpg"
+
+    def save_poster(self, frame, path):
+        try:
+            h, w = frame.shape[:2]
+            size = (POSTER_WIDTH, max(1, h * POSTER_WIDTH // w))
+            poster = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            cv2.imwrite(path, poster, [cv2.IMWRITE_JPEG_QUALITY, POSTER_QUALITY])
+        except Exception as e:
+            log(f"Poster error: {e}")
+
     async def upload_file(self, file_path, filename):
         try:
-            with open(file_path, 'rb') as f:
+            # Uploads run in a thread so throttled reads never stall the event loop
+            await self.governor.wait_for_bulk()
+            bucket = self.supabase.storage.from_("videos")
+            with self.governor.open(file_path) as f:
                 storage_path = f"{self.employee_id}/{filename}"
-                self.supabase.storage.from_("videos").upload(
+                await asyncio.to_thread(
+                    bucket.upload,
                     file=f, 
                     path=storage_path, 
                     file_options={"content-type": "video/x-msvideo", "upsert": "true"}
                 )
+
+            thumbnail_path = None
+            local_poster = self.poster_path(file_path)
+            if os.path.exists(local_poster):
+                with self.governor.open(local_poster) as f:
+                    thumbnail_path = f"{self.employee_id}/posters/{os.path.basename(local_poster)}"
+                    await asyncio.to_thread(
+                        bucket.upload,
+                        file=f,
+                        path=thumbnail_path,
+                        file_options={"content-type": "image/jpeg", "upsert": "true"}
+                    )
             
             self.supabase.table("videos").insert({
                 "employee_id": self.employee_id,
                 "storage_path": storage_path,
+                "thumbnail_path": thumbnail_path,
                 "url": storage_path 
             }).execute()
             return True
         except Exception as e:
             log(f"Upload error: {e}")
+            self.scheduler.note_error(e)
             return False
 
     async def sync_cache(self):
@@ -160,8 +204,9 @@ class VideoRecorderService:
             pass
 
     def delete_file(self, path):
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except:
-            pass
+        for p in (path, self.poster_path(path)):
+            try:
+                if os.path.exists(p):
+                    os.remove(p)
+            except:
+                pass
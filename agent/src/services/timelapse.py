@@ -0,0 +1,235 @@
+import asyncio
+import json
+import os
+import av
+import cv2
+from supabase import Client
+
+from services.bandwidth import BandwidthGovernor
+from services.scheduler import Scheduler
+
+# Log helper
+log_file = os.path.join(os.getenv('APPDATA'), 'AlaskaCache', 'agent.log')
+def log(msg):
+    try:
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(f"[Timelapse] {msg}\n")
+    except:
+        pass
+
+# Encoding
+DEFAULT_SEGMENT = 3600
+MIN_SEGMENT = 60
+# Staged frames are downscaled JPEGs; past the byte budget the current
+# segment is packed early, and frames are only dropped if packing fails
+STAGE_MAX_WIDTH = 1920
+STAGE_QUALITY = 90
+MAX_STAGED_BYTES = 32 * 1024 * 1024
+FRAME_RATE = 1
+KEYFRAME_INTERVAL = 60
+CODEC_OPTIONS = {"crf": "30", "preset": "slow", "tune": "stillimage"}
+
+class TimelapsePacker:
+    """Stages periodic screenshots locally and packs them into hourly video segments.
+
+    Each segment is an H.264 MP4 at FRAME_RATE fps with one frame per capture,
+    so frame N sits at N / FRAME_RATE seconds. The capture time of every frame
+    is kept in a JSON index next to the segment and in its metadata row.
+    """
+
+    def __init__(self, supabase: Client, employee_id: str, scheduler: Scheduler, governor: BandwidthGovernor, cache_dir: str):
+        self.supabase = supabase
+        self.employee_id = employee_id
+        self.scheduler = scheduler
+        self.governor = governor
+        self.segment_seconds = DEFAULT_SEGMENT
+        # Packing runs in threads; one pack at a time so segments are never packed twice.
+        # Uploads take their own lock so staging and packing never wait on the network.
+        self.lock = asyncio.Lock()
+        self.upload_lock = asyncio.Lock()
+        self.frames_dir = os.path.join(cache_dir, 'timelapse', 'frames')
+        self.segments_dir = os.path.join(cache_dir, 'timelapse', 'segments')
+        os.makedirs(self.frames_dir, exist_ok=True)
+        os.makedirs(self.segments_dir, exist_ok=True)
+
+    def set_segment(self, seconds):
+        try:
+            self.segment_seconds = max(MIN_SEGMENT, int(seconds))
+        except (TypeError, ValueError):
+            self.segment_seconds = DEFAULT_SEGMENT
+
+    def segment_of(self, ts):
+        return int(ts // self.segment_seconds)
+
+    def staged_frames(self):
+        """Staged frames as (timestamp, path), oldest first."""
+        frames = []
+        for f in os.listdir(self.frames_dir):
+            if f.startswith("frame_") and f.endswith(".jpg"):
+                try:
+                    frames.append((int(f[6:-4]), os.path.join(self.frames_dir, f)))
+                except ValueError:
+                    pass
+        return sorted(frames)
+
+    def has_staged(self):
+        try:
+            return any(f.endswith(".jpg") for f in os.listdir(self.frames_dir))
+        except:
+            return False
+
+    async def add_frame(self, img, captured_at):
+        """Stage a BGRA frame; packs earlier segments once a new one begins."""
+        path = os.path.join(self.frames_dir, f"frame_{int(captured_at)}.jpg")
+        await asyncio.to_thread(self.stage, img, path)
+        await self.pack(now=captured_at, pack_current=self.staged_bytes() > MAX_STAGED_BYTES)
+        self.prune_staged()
+
+    def stage(self, img, path):
+        h, w = img.shape[:2]
+        if w > STAGE_MAX_WIDTH:
+            img = cv2.resize(img, (STAGE_MAX_WIDTH, h * STAGE_MAX_WIDTH // w), interpolation=cv2.INTER_AREA)
+        cv2.imwrite(path, cv2.cvtColor(img, cv2.COLOR_BGRA2BGR), [cv2.IMWRITE_JPEG_QUALITY, STAGE_QUALITY])
+
+    def staged_bytes(self):
+        try:
+            return sum(os.path.getsize(path) for _, path in self.staged_frames())
+        except:
+            return 0
+
+    def prune_staged(self):
+        # Keep disk bounded if packing keeps failing
+        try:
+            frames = self.staged_frames()
+            total = sum(os.path.getsize(path) for _, path in frames)
+            for _, path in frames:
+                if total <= MAX_STAGED_BYTES:
+                    break
+                total -= os.path.getsize(path)
+                self.delete_file(path)
+        except:
+            pass
+
+    async def sync(self, now=None, pack_current=False):
+        """Pack finished segments and upload any that are still pending."""
+        await self.pack(now, pack_current)
+        await self.upload_pending()
+
+    async def pack(self, now=None, pack_current=False):
+        """Pack every staged segment except the one `now` falls in (unless `pack_current`)."""
+        async with self.lock:
+            try:
+                current = None if pack_current or now is None else self.segment_of(now)
+                segments = {}
+                for ts, path in self.staged_frames():
+                    key = self.segment_of(ts)
+                    if key != current:
+                        segments.setdefault(key, []).append((ts, path))
+
+                for key, frames in sorted(segments.items()):
+                    await asyncio.to_thread(self.pack_segment, key, frames)
+            except Exception as e:
+                log(f"Pack error: {e}")
+
+    def has_pending(self):
+        try:
+            return any(f.endswith(".mp4") for f in os.listdir(self.segments_dir))
+        except:
+            return False
+
+    async def upload_pending(self):
+        """Upload packed segments; stops while a live session is active and leaves the rest for a later call."""
+        if self.upload_lock.locked():
+            return
+        async with self.upload_lock:
+            try:
+                for f in sorted(os.listdir(self.segments_dir)):
+                    if self.governor.live:
+                        break
+                    if f.endswith(".mp4"):
+                        await self.upload_segment(os.path.join(self.segments_dir, f))
+            except Exception as e:
+                log(f"Sync error: {e}")
+
+    def pack_segment(self, key, frames):
+        start_ts = frames[0][0]
+        out_path = os.path.join(self.segments_dir, f"segment_{start_ts}.mp4")
+        index = {"frame_rate": FRAME_RATE, "frames": []}
+
+        container = av.open(out_path, mode="w")
+        try:
+            stream = None
+            for ts, path in frames:
+                img = cv2.imread(path)
+                if img is None:
+                    continue
+                if stream is None:
+                    h, w = img.shape[:2]
+                    stream = container.add_stream("libx264", rate=FRAME_RATE)
+                    stream.width = w - w % 2
+                    stream.height = h - h % 2
+                    stream.pix_fmt = "yuv420p"
+                    stream.gop_size = KEYFRAME_INTERVAL
+                    stream.options = CODEC_OPTIONS
+
+                frame = av.VideoFrame.from_ndarray(img, format="bgr24")
+                frame = frame.reformat(width=stream.width, height=stream.height, format="yuv420p")
+                frame.pts = len(index["frames"])
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+                index["frames"].append(ts)
+
+            if stream is not None:
+                for packet in stream.encode():
+                    container.mux(packet)
+        finally:
+            container.close()
+
+        if index["frames"]:
+            with open(self.index_path(out_path), "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            log(f"Packed {len(index['frames'])} frames: {os.path.basename(out_path)}")
+        else:
+            self.delete_file(out_path)
+
+        for _, path in frames:
+            self.delete_file(path)
+
+    def index_path(self, path):
+        return os.path.splitext(path)[0] + ".json"
+
+    async def upload_segment(self, file_path):
+        filename = os.path.basename(file_path)
+        try:
+            with open(self.index_path(file_path), "r", encoding="utf-8") as f:
+                index = json.load(f)
+
+            bucket = self.supabase.storage.from_("screenshots")
+            with self.governor.open(file_path) as f:
+                storage_path = f"{self.employee_id}/timelapse/{filename}"
+                await asyncio.to_thread(
+                    bucket.upload, file=f, path=storage_path, file_options={"content-type": "video/mp4", "upsert": "true"}
+                )
+
+            self.supabase.table("timelapses").insert({
+                "employee_id": self.employee_id,
+                "storage_path": storage_path,
+                "url": storage_path,
+                "frame_index": index
+            }).execute()
+
+            log(f"Uploaded: {filename}")
+            self.delete_file(file_path)
+            self.delete_file(self.index_path(file_path))
+            return True
+        except Exception as e:
+            log(f"Upload error: {e}")
+            self.scheduler.note_error(e)
+            return False
+
+    def delete_file(self, path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except:
+            pass
@@ -0,0 +1,31 @@
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection pool shared by PostgREST and storage calls
+MAX_CONNECTIONS = 8
+MAX_KEEPALIVE = 4
+KEEPALIVE_EXPIRY = 300
+TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+def create_http_client() -> httpx.Client:
+    """Build the single keep-alive HTTP client every Supabase call goes through.
+
+    The longest agent poll interval (30s heartbeat) stays well under
+    KEEPALIVE_EXPIRY, so steady-state traffic never pays for a new TCP/TLS
+    handshake. HTTP/2 is used when `h2` is installed.
+    """
+    return httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=TIMEOUT,
+        follow_redirects=True,
+    )
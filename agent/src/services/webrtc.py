@@ -11,21 +11,59 @@ from aiortc.contrib.media import MediaPlayer
 from av import VideoFrame
 from supabase import Client
 
+from services.bandwidth import BandwidthGovernor
+
 # Disable pyautogui fail-safe
 pyautogui.FAILSAFE = False
 
+# Screen track backpressure
+FRAME_PERIOD = 1 / 30
+LAG_SMOOTHING = 0.2
+MIN_SCALE = 0.25
+RECOVERY_FRAMES = 90
+
+# How often the live outgoing bitrate is reported to the bandwidth governor
+STATS_INTERVAL = 1
+
 class ScreenVideoTrack(VideoStreamTrack):
     def __init__(self):
         super().__init__()
         self.sct = mss.mss()
         self.monitor = self.sct.monitors[1]
+        self.scale = 1.0
+        self.avg_period = FRAME_PERIOD
+        self.last_recv = None
+        self.steady_frames = 0
+
+    def adapt_scale(self):
+        # recv is pulled by the encoder; if calls arrive late it is not keeping up
+        now = time.monotonic()
+        if self.last_recv is not None:
+            period = now - self.last_recv
+            self.avg_period += LAG_SMOOTHING * (period - self.avg_period)
+            if self.avg_period > FRAME_PERIOD * 2:
+                self.steady_frames = 0
+                if self.scale > MIN_SCALE:
+                    self.scale = max(MIN_SCALE, self.scale / 2)
+                    self.avg_period = FRAME_PERIOD
+            elif self.avg_period < FRAME_PERIOD * 1.2:
+                self.steady_frames += 1
+                if self.steady_frames >= RECOVERY_FRAMES and self.scale < 1.0:
+                    self.scale = min(1.0, self.scale * 1.25)
+                    self.steady_frames = 0
+        self.last_recv = now
 
     async def recv(self):
         pts, time_base = await self.next_timestamp()
+        self.adapt_scale()
         
         # Capture screen
-        sct_img = self.sct.grab(self.monitor)
-        frame = VideoFrame.from_ndarray(np.array(sct_img), format="bgra")
+        img = np.array(self.sct.grab(self.monitor))
+        if self.scale < 1.0:
+            h, w = img.shape[:2]
+            size = (int(w * self.scale) // 2 * 2, int(h * self.scale) // 2 * 2)
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        frame = VideoFrame.from_ndarray(img, format="bgra")
         frame.pts = pts
         frame.time_base = time_base
         return frame
@@ -49,10 +87,12 @@ class CameraVideoTrack(VideoStreamTrack):
         return frame
 
 class WebRTCService:
-    def __init__(self, supabase: Client, employee_id: str):
+    def __init__(self, supabase: Client, employee_id: str, governor: BandwidthGovernor):
         self.supabase = supabase
         self.employee_id = employee_id
+        self.governor = governor
         self.pc = None
+        self.stats_task = None
         self.screen_track = None
         self.cam_track = None
 
@@ -80,6 +120,8 @@ class WebRTCService:
 
         if self.pc:
             await self.pc.close()
+        if self.stats_task:
+            self.stats_task.cancel()
         
         self.pc = RTCPeerConnection()
         
@@ -93,6 +135,8 @@ class WebRTCService:
         async def on_icestate_change():
             print(f"ICE Connection State: {self.pc.iceConnectionState}")
 
+        self.stats_task = asyncio.create_task(self.report_bitrate(self.pc))
+
         await self.pc.setRemoteDescription(offer)
         
         answer = await self.pc.createAnswer()
@@ -106,6 +150,30 @@ class WebRTCService:
         })
         print("Sent ANSWER")
 
+    async def report_bitrate(self, pc):
+        # Feed the live stream's outgoing bitrate to the governor so bulk uploads yield to it
+        last_bytes, last_time = None, None
+        try:
+            while pc.connectionState not in ("closed", "failed"):
+                await asyncio.sleep(STATS_INTERVAL)
+                if pc.connectionState != "connected":
+                    self.governor.set_live(False)
+                    last_bytes = None
+                    continue
+
+                report = await pc.getStats()
+                sent = sum(s.bytesSent for s in report.values() if s.type == "outbound-rtp")
+                now = time.monotonic()
+                rate = 0
+                if last_bytes is not None and now > last_time:
+                    rate = max(0, sent - last_bytes) / (now - last_time)
+                last_bytes, last_time = sent, now
+                self.governor.set_live(True, rate)
+        except Exception as e:
+            print(f"Stats Error: {e}")
+        finally:
+            self.governor.set_live(False)
+
     async def handle_ice(self, payload):
         candidate = payload["payload"]
         # AIORTC handles ICE internally mostly, but for full trickle ICE 
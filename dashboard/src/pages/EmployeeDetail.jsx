@@ -1,7 +1,7 @@
 import { useEffect, useState, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { supabase } from '../lib/supabase';
-import { ArrowLeft, Video, Keyboard, Image as ImageIcon, Settings, Wifi, WifiOff, MonitorPlay, MousePointer2, Camera, RefreshCw, Download } from 'lucide-react';
+import { ArrowLeft, Video, Keyboard, Image as ImageIcon, Settings, Wifi, WifiOff, MonitorPlay, MousePointer2, Camera, RefreshCw, Download, Film } from 'lucide-react';
 
 export default function EmployeeDetail() {
     const { id } = useParams();
@@ -11,6 +11,8 @@ export default function EmployeeDetail() {
     const [keylogs, setKeylogs] = useState([]);
     const [screenshots, setScreenshots] = useState([]);
     const [videos, setVideos] = useState([]);
+    const [timelapses, setTimelapses] = useState([]);
+    const timelapseRefs = useRef({});
     const [isOnline, setIsOnline] = useState(false);
 
     const [isStreaming, setIsStreaming] = useState(false);
@@ -20,7 +22,7 @@ export default function EmployeeDetail() {
     const channelRef = useRef(null);
     const controlChannelRef = useRef(null);
 
-    const [settings, setSettings] = useState({ screenshot_interval: 300, video_duration: 10, screenshots_enabled: false });
+    const [settings, setSettings] = useState({ screenshot_interval: 300, video_duration: 10, screenshots_enabled: false, timelapse_enabled: false });
     const [savingSettings, setSavingSettings] = useState(false);
     const [requestingScreenshot, setRequestingScreenshot] = useState(false);
     const [requestingVideo, setRequestingVideo] = useState(false);
@@ -36,6 +38,8 @@ export default function EmployeeDetail() {
                 payload => { setScreenshots(prev => [resolveUrl(payload.new, 'screenshots'), ...prev]); setRequestingScreenshot(false); })
             .on('postgres_changes', { event: 'INSERT', schema: 'public', table: 'videos', filter: `employee_id=eq.${id}` },
                 payload => { setVideos(prev => [resolveUrl(payload.new, 'videos'), ...prev]); setRequestingVideo(false); })
+            .on('postgres_changes', { event: 'INSERT', schema: 'public', table: 'timelapses', filter: `employee_id=eq.${id}` },
+                payload => setTimelapses(prev => [resolveUrl(payload.new, 'screenshots'), ...prev]))
             .on('postgres_changes', { event: 'UPDATE', schema: 'public', table: 'employees', filter: `id=eq.${id}` },
                 payload => {
                     setEmployee(payload.new);
@@ -58,7 +62,11 @@ export default function EmployeeDetail() {
         }
     }, [id]);
 
-    const resolveUrl = (item, bucket) => ({ ...item, publicUrl: item.url.startsWith('http') ? item.url : supabase.storage.from(bucket).getPublicUrl(item.storage_path).data.publicUrl });
+    const resolveUrl = (item, bucket) => {
+        const publicUrl = item.url.startsWith('http') ? item.url : supabase.storage.from(bucket).getPublicUrl(item.storage_path).data.publicUrl;
+        const thumbUrl = item.thumbnail_path ? supabase.storage.from(bucket).getPublicUrl(item.thumbnail_path).data.publicUrl : null;
+        return { ...item, publicUrl, thumbUrl };
+    };
 
     const fetchEmployee = async () => {
         const { data } = await supabase.from('employees').select('*').eq('id', id).single();
@@ -76,6 +84,14 @@ export default function EmployeeDetail() {
         if (s.data) setScreenshots(s.data.map(i => resolveUrl(i, 'screenshots')));
         const v = await supabase.from('videos').select('*').eq('employee_id', id).order('created_at', { ascending: false }).limit(10);
         if (v.data) setVideos(v.data.map(i => resolveUrl(i, 'videos')));
+        const t = await supabase.from('timelapses').select('*').eq('employee_id', id).order('created_at', { ascending: false }).limit(10);
+        if (t.data) setTimelapses(t.data.map(i => resolveUrl(i, 'screenshots')));
+    };
+
+    // frame_index.frames[i] is the capture time (unix seconds) of frame i
+    const seekTimelapse = (lapse, i) => {
+        const el = timelapseRefs.current[lapse.id];
+        if (el) el.currentTime = (i + 0.5) / (lapse.frame_index?.frame_rate || 1);
     };
 
     const saveSettings = async () => {
@@ -214,6 +230,10 @@ export default function EmployeeDetail() {
                                 <span>Capturas automáticas</span>
                                 <input type="checkbox" checked={settings.screenshots_enabled} onChange={e => setSettings({ ...settings, screenshots_enabled: e.target.checked })} className="w-4 h-4 accent-blue-600" />
                             </label>
+                            <label className="flex items-center justify-between">
+                                <span>Archivar como timelapse</span>
+                                <input type="checkbox" checked={!!settings.timelapse_enabled} onChange={e => setSettings({ ...settings, timelapse_enabled: e.target.checked })} className="w-4 h-4 accent-blue-600" />
+                            </label>
                             <label className="flex items-center justify-between">
                                 <span>Intervalo (seg)</span>
                                 <input type="number" value={settings.screenshot_interval} onChange={e => setSettings({ ...settings, screenshot_interval: parseInt(e.target.value) })} className="border rounded p-1 w-20 text-right" />
@@ -222,6 +242,10 @@ export default function EmployeeDetail() {
                                 <span>Duración video (seg)</span>
                                 <input type="number" value={settings.video_duration} onChange={e => setSettings({ ...settings, video_duration: parseInt(e.target.value) })} className="border rounded p-1 w-20 text-right" />
                             </label>
+                            <label className="flex items-center justify-between">
+                                <span>Límite subida (KB/s, 0 = sin límite)</span>
+                                <input type="number" value={settings.upload_cap_kBps || 0} onChange={e => setSettings({ ...settings, upload_cap_kBps: parseInt(e.target.value) || 0 })} className="border rounded p-1 w-20 text-right" />
+                            </label>
                             <button onClick={saveSettings} disabled={savingSettings} className="w-full bg-gray-100 hover:bg-gray-200 text-gray-800 py-2 rounded-lg text-sm mt-2 transition">
                                 {savingSettings ? 'Guardando...' : 'Guardar Configuración'}
                             </button>
@@ -265,19 +289,47 @@ export default function EmployeeDetail() {
                         <div className="flex gap-2 overflow-x-auto pb-2">
                             {screenshots.slice(0, 6).map(shot => (
                                 <a key={shot.id} href={shot.publicUrl} target="_blank" rel="noreferrer" className="flex-shrink-0 w-24 hover:opacity-80 transition">
-                                    <img src={shot.publicUrl} className="w-full h-16 object-cover rounded-lg border shadow-sm" />
+                                    <img src={shot.thumbUrl || shot.publicUrl} loading="lazy" className="w-full h-16 object-cover rounded-lg border shadow-sm" />
                                 </a>
                             ))}
                         </div>
                     </div>
 
+                    {/* Timelapses */}
+                    {(settings.timelapse_enabled || timelapses.length > 0) && (
+                        <div className="bg-white p-4 rounded-xl shadow-sm border flex-shrink-0">
+                            <h3 className="font-semibold text-gray-700 flex items-center gap-2 mb-2"><Film className="w-4 h-4" /> Timelapses</h3>
+                            <div className="space-y-2 overflow-y-auto" style={{ maxHeight: '200px' }}>
+                                {timelapses.length === 0 && <p className="text-xs text-gray-400">Sin segmentos todavía.</p>}
+                                {timelapses.slice(0, 4).map(lapse => {
+                                    const frames = lapse.frame_index?.frames || [];
+                                    return (
+                                        <div key={lapse.id} className="flex gap-2 items-start">
+                                            <video ref={el => { timelapseRefs.current[lapse.id] = el; }} src={lapse.publicUrl} preload="metadata" controls className="w-32 h-20 flex-shrink-0 object-cover rounded-lg border shadow-sm bg-black" />
+                                            <div className="text-xs text-gray-600 min-w-0 flex-1">
+                                                <div>{frames.length} capturas</div>
+                                                {frames.length > 0 && (
+                                                    <div>{new Date(frames[0] * 1000).toLocaleTimeString()} – {new Date(frames[frames.length - 1] * 1000).toLocaleTimeString()}</div>
+                                                )}
+                                                <select defaultValue="" onChange={e => seekTimelapse(lapse, parseInt(e.target.value))} className="border rounded p-1 mt-1 w-full">
+                                                    <option value="" disabled>Ir a captura…</option>
+                                                    {frames.map((ts, i) => <option key={i} value={i}>{new Date(ts * 1000).toLocaleTimeString()}</option>)}
+                                                </select>
+                                            </div>
+                                        </div>
+                                    );
+                                })}
+                            </div>
+                        </div>
+                    )}
+
                     {/* Videos */}
                     <div className="bg-white p-4 rounded-xl shadow-sm border flex-shrink-0" style={{ height: '160px' }}>
                         <h3 className="font-semibold text-gray-700 flex items-center gap-2 mb-2"><Video className="w-4 h-4" /> Videos Recientes</h3>
                         <div className="flex gap-2 overflow-x-auto pb-2">
                             {videos.slice(0, 4).map(vid => (
                                 <div key={vid.id} className="flex-shrink-0 w-32">
-                                    <video src={vid.publicUrl} controls className="w-full h-20 object-cover rounded-lg border shadow-sm bg-black" />
+                                    <video src={vid.publicUrl} poster={vid.thumbUrl || undefined} preload={vid.thumbUrl ? 'none' : 'metadata'} controls className="w-full h-20 object-cover rounded-lg border shadow-sm bg-black" />
                                 </div>
                             ))}
                         </div>